@@ -1,12 +1,19 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import os
 import bcrypt
+import orjson
+import pyarrow as pa
+from pyarrow import csv as pacsv
 import requests
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 import plotly.express as px
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
 from io import BytesIO
-from PIL import Image, ImageDraw, ImageFilter
+from PIL import Image, ImageFilter
 import math
 
 # ----------------------------
@@ -18,84 +25,201 @@ st.set_page_config(page_title="SmartHarvest Portal", page_icon="🌾", layout="w
 USER_DIR = "users"
 os.makedirs(USER_DIR, exist_ok=True)
 
+# Per-user record tables and their columns
+DEFAULT_COLUMNS = {
+    "expenses": ["Date", "Category", "Amount", "Notes"],
+    "fertilizer": ["Date", "Crop", "Type", "Quantity_kg", "Notes"],
+    "livestock": ["Date", "Animal_Type", "Count", "Health_Notes"],
+    "yield": ["Date", "Crop", "Area_ha", "Yield_kg", "Notes"],
+}
+
+# Numeric columns are stored as float32 so the dashboard reductions run on
+# the raw buffer without a per-rerun cast (float32 also tolerates blank
+# cells left by the data editor, unlike an int dtype)
+NUMERIC_DTYPES = {
+    "Amount": "float32",
+    "Quantity_kg": "float32",
+    "Yield_kg": "float32",
+    "Area_ha": "float32",
+    "Count": "float32",
+}
+
 # ----------------------------
 # Helper Functions
 # ----------------------------
+# bcrypt cost factor; each +1 doubles hashing time. 10 keeps login/signup
+# snappy while staying a reasonable security margin; override per deployment.
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", "10"))
+
 def hash_password(password):
-    return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode()
+
+def _hash_one(password):
+    # module-level so ProcessPoolExecutor workers can pickle it
+    return bcrypt.hashpw(str(password).encode(), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode()
 
 def check_password(password, hashed):
     return bcrypt.checkpw(password.encode(), hashed.encode())
 
+def _read_csv_arrow(path, columns=()):
+    """Read a CSV through pyarrow's multithreaded parser into a DataFrame."""
+    column_types = {
+        c: pa.type_for_alias(NUMERIC_DTYPES[c]) for c in columns if c in NUMERIC_DTYPES
+    }
+    table = pacsv.read_csv(
+        path, convert_options=pacsv.ConvertOptions(column_types=column_types)
+    )
+    return table.to_pandas()
+
+def _migrate_csv_records(path):
+    """One-time rewrite of legacy per-user CSV record files into Parquet."""
+    for key, columns in DEFAULT_COLUMNS.items():
+        csv_path = os.path.join(path, f"{key}.csv")
+        if os.path.exists(csv_path):
+            pq_path = os.path.join(path, f"{key}.parquet")
+            if not os.path.exists(pq_path):
+                df = _read_csv_arrow(csv_path, columns)
+                if "Date" in df.columns:
+                    df["Date"] = pd.to_datetime(df["Date"], errors="coerce")
+                df.to_parquet(pq_path, compression="snappy")
+            os.remove(csv_path)
+
+# user dirs already created (and CSV-migrated) this process; skips the
+# stat+mkdir syscalls that get_user_path otherwise pays on every call
+_KNOWN_USER_DIRS = set()
+
 def get_user_path(username):
     path = os.path.join(USER_DIR, username)
+    if path in _KNOWN_USER_DIRS:
+        return path
     os.makedirs(path, exist_ok=True)
+    _migrate_csv_records(path)
+    _KNOWN_USER_DIRS.add(path)
     return path
 
+@st.cache_data(show_spinner=False)
+def _load_df_cached(path, mtime, columns):
+    # mtime is part of the cache key so the entry invalidates when save_df rewrites the file
+    if mtime is None:
+        return pd.DataFrame(columns=list(columns))
+    df = pd.read_parquet(path)
+    # legacy files may hold Date as strings; parse once here, in the cache
+    if "Date" in df.columns and not pd.api.types.is_datetime64_any_dtype(df["Date"]):
+        df["Date"] = pd.to_datetime(df["Date"], errors="coerce")
+    return df
+
 def load_df(username, key, columns):
-    path = os.path.join(get_user_path(username), f"{key}.csv")
-    if os.path.exists(path):
-        return pd.read_csv(path)
-    return pd.DataFrame(columns=columns)
+    path = os.path.join(get_user_path(username), f"{key}.parquet")
+    mtime = os.path.getmtime(path) if os.path.exists(path) else None
+    return _load_df_cached(path, mtime, tuple(columns))
+
+@st.cache_data(show_spinner=False)
+def _load_user_bundle_cached(username, mtimes):
+    return {k: load_df(username, k, DEFAULT_COLUMNS[k]) for k in DEFAULT_COLUMNS}
+
+def load_user_bundle(username):
+    """Load all four record tables for a user behind one cache entry."""
+    user_path = get_user_path(username)
+    mtimes = tuple(
+        os.path.getmtime(p) if os.path.exists(p) else 0
+        for p in (os.path.join(user_path, f"{k}.parquet") for k in DEFAULT_COLUMNS)
+    )
+    return _load_user_bundle_cached(username, mtimes)
 
 def save_df(username, key, df):
-    path = os.path.join(get_user_path(username), f"{key}.csv")
-    df.to_csv(path, index=False)
+    path = os.path.join(get_user_path(username), f"{key}.parquet")
+    # coerce numeric and date columns so Parquet stores typed buffers, not
+    # strings typed by the editor
+    for c in df.columns:
+        if c in NUMERIC_DTYPES:
+            df[c] = pd.to_numeric(df[c], errors="coerce").astype(NUMERIC_DTYPES[c])
+        elif c == "Date":
+            df[c] = pd.to_datetime(df[c], errors="coerce")
+    df.to_parquet(path, compression="snappy")
+    _load_df_cached.clear()
+
+@st.cache_data(show_spinner=False)
+def _load_users_cached(users_file, mtime):
+    return _read_csv_arrow(users_file)
+
+def _migrate_plaintext_passwords(df, users_file):
+    """One-shot migration of plaintext passwords to bcrypt hashes.
+
+    Guarded by a sentinel file so the check is skipped entirely once the
+    table is known to be fully hashed.
+    """
+    sentinel = os.path.join(USER_DIR, ".migrated")
+    if os.path.exists(sentinel):
+        return df
+    # bcrypt hashes start with $2b$ or $2a$ or $2y$
+    needs_migration = ~df["password"].astype(str).str.startswith("$2")
+    if needs_migration.any():
+        # treat stored values as plaintext and hash them; each hash is
+        # independent, so large batches fan out across cores
+        plaintexts = df.loc[needs_migration, "password"].tolist()
+        if len(plaintexts) > 8:
+            with ProcessPoolExecutor() as ex:
+                hashes = list(ex.map(_hash_one, plaintexts))
+        else:
+            hashes = [_hash_one(p) for p in plaintexts]
+        df.loc[needs_migration, "password"] = hashes
+        df.to_csv(users_file, index=False)
+    open(sentinel, "w").close()
+    return df
 
 def load_users():
     users_file = os.path.join(USER_DIR, "users.csv")
     if os.path.exists(users_file):
-        df = pd.read_csv(users_file)
-        # Migrate plaintext passwords to bcrypt hashes if needed
-        changed = False
-        for idx, row in df.iterrows():
-            pwd = str(row.get("password", ""))
-            # bcrypt hashes start with $2b$ or $2a$ or $2y$
-            if not pwd.startswith("$2"):
-                try:
-                    # treat stored value as plaintext and hash it
-                    hashed = bcrypt.hashpw(pwd.encode(), bcrypt.gensalt()).decode()
-                    df.at[idx, "password"] = hashed
-                    changed = True
-                except Exception:
-                    # if something goes wrong, leave as-is
-                    pass
-        if changed:
-            df.to_csv(users_file, index=False)
-        return df
+        df = _load_users_cached(users_file, os.path.getmtime(users_file))
+        return _migrate_plaintext_passwords(df, users_file)
     return pd.DataFrame(columns=["username", "password"])
 
 def save_users(df):
     df.to_csv(os.path.join(USER_DIR, "users.csv"), index=False)
+    _load_users_cached.clear()
+
+def _users_mtime():
+    users_file = os.path.join(USER_DIR, "users.csv")
+    return os.path.getmtime(users_file) if os.path.exists(users_file) else 0
+
+@st.cache_data(show_spinner=False)
+def _user_index(mtime):
+    """username -> password hash map for O(1) auth lookups."""
+    df = load_users()
+    return dict(zip(df["username"], df["password"]))
 
 # ----------------------------
 # Authentication
 # ----------------------------
 def register_user(username, password):
-    users = load_users()
-    if username in users["username"].values:
+    if username in _user_index(_users_mtime()):
         st.warning("Username already exists.")
         return False
+    users = load_users()
     hashed = hash_password(password)
-    new_user = pd.DataFrame([[username, hashed]], columns=["username", "password"])
-    users = pd.concat([users, new_user], ignore_index=True)
+    # single-row in-place append; pd.concat would copy the whole table
+    users.loc[len(users)] = [username, hashed]
     save_users(users)
     get_user_path(username)
     st.success("Account created! Please log in.")
     return True
 
 def login_user(username, password):
-    users = load_users()
-    user_row = users[users["username"] == username]
-    if not user_row.empty:
-        hashed = user_row.iloc[0]["password"]
-        if check_password(password, hashed):
-            return True
-    return False
+    hashed = _user_index(_users_mtime()).get(username)
+    return hashed is not None and check_password(password, hashed)
 
 # ----------------------------
 # Weather utilities
 # ----------------------------
+@st.cache_resource(show_spinner=False)
+def _http_session():
+    # pooled session so repeated Open-Meteo calls reuse one TCP/TLS
+    # connection; cache_resource keeps a single instance per process
+    s = requests.Session()
+    s.mount("https://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=8))
+    return s
+
+@st.cache_data(ttl=1800, show_spinner=False)
 def fetch_weather(lat, lon, hours=48):
     url = "https://api.open-meteo.com/v1/forecast"
     params = {
@@ -104,18 +228,19 @@ def fetch_weather(lat, lon, hours=48):
         "hourly": "temperature_2m,precipitation,cloudcover,weathercode",
         "timezone": "UTC",
     }
-    r = requests.get(url, params=params, timeout=10)
+    r = _http_session().get(url, params=params, timeout=10)
     r.raise_for_status()
-    return r.json()
+    return orjson.loads(r.content)
 
 
+@st.cache_data(ttl=86400, show_spinner=False)
 def geocode_place(place_name):
     """Use Open-Meteo geocoding to resolve a city/place name to lat/lon."""
     url = "https://geocoding-api.open-meteo.com/v1/search"
     params = {"name": place_name, "count": 1}
-    r = requests.get(url, params=params, timeout=8)
+    r = _http_session().get(url, params=params, timeout=8)
     r.raise_for_status()
-    j = r.json()
+    j = orjson.loads(r.content)
     results = j.get("results")
     if not results:
         return None
@@ -123,72 +248,127 @@ def geocode_place(place_name):
 
 def will_rain_in_next_hours(weather_json, hours=6):
     hourly = weather_json.get("hourly", {})
-    precipitation = hourly.get("precipitation", [])
     times = hourly.get("time", [])
-    for i in range(min(hours, len(precipitation))):
-        if float(precipitation[i]) > 0:
-            return True, times[i]
-    return False, None
+    arr = np.asarray(hourly.get("precipitation", [])[:hours], dtype=np.float32)
+    hits = arr > 0
+    if not hits.any():
+        return False, None
+    return True, times[int(hits.argmax())]
+
+# Cloudcover label buckets: <30 clear, 30-74 partly cloudy, >=75 dark
+_CLOUD_BINS = [30, 75]
+_CLOUD_LABELS = np.array(["☀️ Clear Skies", "🌥️ Partly Cloudy", "🌧️ Dark Clouds"])
 
 def cloud_visual(cloudcover):
-    if cloudcover >= 75:
-        return "🌧️ Dark Clouds"
-    elif cloudcover >= 30:
-        return "🌥️ Partly Cloudy"
-    else:
-        return "☀️ Clear Skies"
+    # works for scalars and arrays alike via np.digitize
+    return _CLOUD_LABELS[np.digitize(cloudcover, _CLOUD_BINS)]
 
 
-def generate_cloud_image(cloudcover: float, width=640, height=240) -> BytesIO:
-    """Generate a simple cloud illustration whose appearance depends on cloudcover (0-100).
+# Coordinate grid for the vectorized cloud renderer, built once per size
+@st.cache_resource(show_spinner=False)
+def _cloud_grid(width, height):
+    return np.mgrid[0:height, 0:width]
 
-    Returns a BytesIO PNG image.
-    """
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def _render_cloud_png(cloudcover, width, height):
     # Normalize
     c = max(0, min(100, float(cloudcover)))
-    # background color shifts darker with more clouds
-    sky_clear = (135, 206, 235)
-    sky_overcast = (70, 80, 90)
-    mix = lambda a, b, t: tuple(int(a[i] * (1 - t) + b[i] * t) for i in range(3))
     t = c / 100.0
-    bg = mix(sky_clear, sky_overcast, t)
-
-    img = Image.new("RGBA", (width, height), bg + (255,))
-    draw = ImageDraw.Draw(img, "RGBA")
-
-    # Draw layered clouds: number and darkness depend on c
-    cloud_color_light = (255, 255, 255, 230)
-    cloud_color_dark = (180, 180, 190, 255)
-
-    # determine number of cloud clusters
-    clusters = 1 + int((c / 100.0) * 3)
+    # background color shifts darker with more clouds
+    sky_clear = np.array([135, 206, 235], dtype=np.float32)
+    sky_overcast = np.array([70, 80, 90], dtype=np.float32)
+    bg = sky_clear * (1 - t) + sky_overcast * t
+
+    # cloud color interpolated between light and dark depending on cloudcover
+    cloud_light = np.array([255, 255, 255], dtype=np.float32)
+    cloud_dark = np.array([180, 180, 190], dtype=np.float32)
+    dark_t = 0.3 + 0.7 * t
+    cloud = cloud_light * (1 - dark_t) + cloud_dark * dark_t
+
+    # Layered clouds: number and darkness depend on c. Collect every
+    # ellipse's center/radii, then rasterize them all in one broadcast.
+    clusters = 1 + int(t * 3)
+    layers = 6
+    cx, cy, rx, ry = [], [], [], []
     for cl in range(clusters):
-        base_x = int((cl + 0.5) * width / (clusters + 0.5))
-        base_y = int(height * (0.35 + 0.25 * (cl % 2)))
-        size = int(width * (0.25 + 0.12 * cl))
-        layers = 6
+        base_x = (cl + 0.5) * width / (clusters + 0.5)
+        base_y = height * (0.35 + 0.25 * (cl % 2))
+        size = width * (0.25 + 0.12 * cl)
         for i in range(layers):
             radius = size * (0.6 + 0.1 * (i / layers))
-            offset_x = int((i - layers/2) * (size * 0.12))
-            offset_y = int(((i % 2) - 0.5) * (size * 0.08))
-            bbox = [
-                base_x - radius + offset_x,
-                base_y - radius * 0.6 + offset_y,
-                base_x + radius + offset_x,
-                base_y + radius * 0.6 + offset_y,
-            ]
-            # choose color interpolated between light and dark depending on cloudcover
-            dark_t = 0.3 + 0.7 * t
-            color = mix(cloud_color_light[:3], cloud_color_dark[:3], dark_t)
-            draw.ellipse(bbox, fill=tuple(list(color) + [230]))
-
-    # subtle blur to smooth edges
-    img = img.filter(ImageFilter.GaussianBlur(radius=4))
+            cx.append(base_x + (i - layers / 2) * (size * 0.12))
+            cy.append(base_y + ((i % 2) - 0.5) * (size * 0.08))
+            rx.append(radius)
+            ry.append(radius * 0.6)
+    cx = np.asarray(cx, dtype=np.float32)[:, None, None]
+    cy = np.asarray(cy, dtype=np.float32)[:, None, None]
+    rx = np.asarray(rx, dtype=np.float32)[:, None, None]
+    ry = np.asarray(ry, dtype=np.float32)[:, None, None]
+
+    yy, xx = _cloud_grid(width, height)
+    mask = (((xx[None] - cx) / rx) ** 2 + ((yy[None] - cy) / ry) ** 2 <= 1).any(axis=0)
+
+    arr = np.empty((height, width, 4), dtype=np.uint8)
+    arr[..., :3] = np.where(mask[..., None], cloud, bg).astype(np.uint8)
+    arr[..., 3] = 255
+
+    # subtle blur to smooth edges; a single box pass looks the same here
+    # at a fraction of GaussianBlur's multi-pass convolution cost
+    img = Image.fromarray(arr, "RGBA").filter(ImageFilter.BoxBlur(2))
 
     bio = BytesIO()
     img.save(bio, format="PNG")
-    bio.seek(0)
-    return bio
+    return bio.getvalue()
+
+
+def generate_cloud_image(cloudcover: float, width=640, height=240) -> BytesIO:
+    """Generate a simple cloud illustration whose appearance depends on cloudcover (0-100).
+
+    Returns a BytesIO PNG image.
+    """
+    # bucket to the nearest 5% so near-identical covers share a cache entry
+    bucket = round(max(0, min(100, float(cloudcover))) / 5) * 5
+    return BytesIO(_render_cloud_png(bucket, width, height))
+
+# ----------------------------
+# Chart helpers
+# ----------------------------
+# Cap on points shipped to the browser per plotted line
+MAX_CHART_POINTS = 500
+
+def _lttb_indices(x, y, n_out):
+    """Largest-Triangle-Three-Buckets: pick n_out visually representative indices."""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    # bucket boundaries over the interior points; endpoints are always kept
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    idx = np.empty(n_out, dtype=np.int64)
+    idx[0] = 0
+    idx[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # average of the following bucket anchors the triangle
+        nhi = edges[i + 2] if i + 2 < n_out - 1 else n
+        avg_x = x[hi:nhi].mean()
+        avg_y = y[hi:nhi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(area.argmax())
+        idx[i + 1] = a
+    return idx
+
+def _downsample(df, x, y, n=MAX_CHART_POINTS):
+    """Downsample a frame to at most n rows for plotting, preserving shape."""
+    if len(df) <= n:
+        return df
+    xv = df[x].to_numpy()
+    if np.issubdtype(xv.dtype, np.datetime64):
+        xv = xv.astype("int64")
+    xv = xv.astype(np.float64)
+    yv = pd.to_numeric(df[y], errors="coerce").to_numpy(dtype=np.float64)
+    return df.iloc[_lttb_indices(xv, yv, n)]
 
 # ----------------------------
 # App Logic
@@ -264,65 +444,46 @@ else:
     # ----------------------------
     page = st.sidebar.radio("Navigation", ["Dashboard", "Records", "Weather", "About"])
 
-    # Common Data
-    DEFAULT_COLUMNS = {
-        "expenses": ["Date", "Category", "Amount", "Notes"],
-        "fertilizer": ["Date", "Crop", "Type", "Quantity_kg", "Notes"],
-        "livestock": ["Date", "Animal_Type", "Count", "Health_Notes"],
-        "yield": ["Date", "Crop", "Area_ha", "Yield_kg", "Notes"],
-    }
-
     # ----------------------------
     # RECORDS PAGE
     # ----------------------------
     if page == "Records":
         st.header("📒 Farm Records")
 
+        @st.fragment
+        def records_section(key, title):
+            # a save click reruns only this section, not all four editors
+            st.subheader(title)
+            df = load_df(username, key, DEFAULT_COLUMNS[key])
+            edited = st.data_editor(df, num_rows="dynamic", key=f"editor_{key}")
+            if st.button(f"Save {title}"):
+                save_df(username, key, edited)
+                st.success(f"{title} saved.")
+
         col1, col2 = st.columns(2)
         with col1:
-            st.subheader("Expenses")
-            df_exp = load_df(username, "expenses", DEFAULT_COLUMNS["expenses"])
-            edited_exp = st.data_editor(df_exp, num_rows="dynamic", key="exp")
-            if st.button("Save Expenses"):
-                save_df(username, "expenses", edited_exp)
-                st.success("Expenses saved.")
-
-            st.subheader("Fertilizer")
-            df_fert = load_df(username, "fertilizer", DEFAULT_COLUMNS["fertilizer"])
-            edited_fert = st.data_editor(df_fert, num_rows="dynamic", key="fert")
-            if st.button("Save Fertilizer"):
-                save_df(username, "fertilizer", edited_fert)
-                st.success("Fertilizer saved.")
+            records_section("expenses", "Expenses")
+            records_section("fertilizer", "Fertilizer")
 
         with col2:
-            st.subheader("Livestock")
-            df_liv = load_df(username, "livestock", DEFAULT_COLUMNS["livestock"])
-            edited_liv = st.data_editor(df_liv, num_rows="dynamic", key="liv")
-            if st.button("Save Livestock"):
-                save_df(username, "livestock", edited_liv)
-                st.success("Livestock saved.")
-
-            st.subheader("Yield")
-            df_yield = load_df(username, "yield", DEFAULT_COLUMNS["yield"])
-            edited_yield = st.data_editor(df_yield, num_rows="dynamic", key="yield")
-            if st.button("Save Yield"):
-                save_df(username, "yield", edited_yield)
-                st.success("Yield saved.")
+            records_section("livestock", "Livestock")
+            records_section("yield", "Yield")
 
     # ----------------------------
     # DASHBOARD PAGE
     # ----------------------------
     elif page == "Dashboard":
         st.header("📊 Dashboard Overview")
-        df_exp = load_df(username, "expenses", DEFAULT_COLUMNS["expenses"])
-        df_yield = load_df(username, "yield", DEFAULT_COLUMNS["yield"])
-        df_fert = load_df(username, "fertilizer", DEFAULT_COLUMNS["fertilizer"])
-        df_liv = load_df(username, "livestock", DEFAULT_COLUMNS["livestock"])
+        bundle = load_user_bundle(username)
+        df_exp = bundle["expenses"]
+        df_yield = bundle["yield"]
+        df_fert = bundle["fertilizer"]
+        df_liv = bundle["livestock"]
 
-        total_exp = df_exp["Amount"].astype(float).sum() if not df_exp.empty else 0
-        total_yield = df_yield["Yield_kg"].astype(float).sum() if not df_yield.empty else 0
-        total_fert = df_fert["Quantity_kg"].astype(float).sum() if not df_fert.empty else 0
-        total_animals = df_liv["Count"].astype(float).sum() if not df_liv.empty else 0
+        total_exp = df_exp["Amount"].sum() if not df_exp.empty else 0
+        total_yield = df_yield["Yield_kg"].sum() if not df_yield.empty else 0
+        total_fert = df_fert["Quantity_kg"].sum() if not df_fert.empty else 0
+        total_animals = df_liv["Count"].sum() if not df_liv.empty else 0
 
         c1, c2, c3, c4 = st.columns(4)
         c1.metric("Total Expenses", f"₹{total_exp:,.2f}")
@@ -331,17 +492,35 @@ else:
         c4.metric("Livestock Count", f"{total_animals}")
 
         st.markdown("---")
-        if not df_exp.empty:
-            st.subheader("Expenses by Category")
-            fig = px.pie(df_exp, names="Category", values="Amount", title="Expense Distribution")
+        # compose both charts into one figure: a single serialization and
+        # one chart component instead of two
+        if not df_exp.empty or not df_yield.empty:
+            specs, titles = [], []
+            if not df_exp.empty:
+                specs.append({"type": "domain"})
+                titles.append("Expense Distribution")
+            if not df_yield.empty:
+                specs.append({"type": "xy"})
+                titles.append("Yield Trend")
+            fig = make_subplots(rows=1, cols=len(specs), specs=[specs], subplot_titles=tuple(titles))
+
+            col = 1
+            if not df_exp.empty:
+                fig.add_trace(go.Pie(labels=df_exp["Category"], values=df_exp["Amount"]), row=1, col=col)
+                col += 1
+            if not df_yield.empty:
+                plot_yield = df_yield
+                if len(plot_yield) > MAX_CHART_POINTS:
+                    plot_yield = pd.concat(
+                        [_downsample(g, "Date", "Yield_kg") for _, g in df_yield.groupby("Crop")]
+                    )
+                for crop, g in plot_yield.groupby("Crop"):
+                    fig.add_trace(
+                        go.Scatter(x=g["Date"], y=g["Yield_kg"], mode="lines", name=str(crop)),
+                        row=1, col=col,
+                    )
             st.plotly_chart(fig, use_container_width=True)
 
-        if not df_yield.empty:
-            st.subheader("Yield Over Time")
-            df_yield["Date"] = pd.to_datetime(df_yield["Date"])
-            fig2 = px.line(df_yield, x="Date", y="Yield_kg", color="Crop", title="Yield Trend")
-            st.plotly_chart(fig2, use_container_width=True)
-
     # ----------------------------
     # WEATHER PAGE
     # ----------------------------
@@ -352,7 +531,8 @@ else:
 
         if st.button("Get Weather"):
             try:
-                weather = fetch_weather(float(lat), float(lon))
+                # round so nearby coordinates share a cache entry
+                weather = fetch_weather(round(float(lat), 3), round(float(lon), 3))
                 rain, time_ = will_rain_in_next_hours(weather, hours=6)
                 if rain:
                     st.error(f"🌧️ Rain predicted within next 6 hours at {time_}")
@@ -365,6 +545,8 @@ else:
                     "Precipitation(mm)": hourly["precipitation"],
                     "Cloudcover(%)": hourly["cloudcover"]
                 })
+                # label all rows in one vectorized pass
+                df["Cloud"] = cloud_visual(df["Cloudcover(%)"].values)
                 st.dataframe(df.head(24))
 
                 fig = px.line(df.head(24), x="Time", y="Precipitation(mm)", title="Precipitation Next 24h")